@@ -12,13 +12,18 @@
 An app that syncs the frame range between a scene and a shot in Shotgun.
 
 """
+import hashlib
 import os
+import random
+import time
 import traceback
 
 from tank.platform import Application
-from tank.platform.qt import QtGui
 import tank
 
+# Shortest time, in seconds, between two attempts of a session at starting the editorial service.
+EDITORIAL_SERVICE_RETRY_DELAY = 30
+
 
 class SetEditData(Application):
     """
@@ -42,6 +47,32 @@ class SetEditData(Application):
                 "an entity as part of the context in order to work."
             )
 
+        # Qt free helpers, also used by the public sync API.
+        self._tk_multi_setframerange = self.import_module("tk_multi_setframerange")
+
+        # Shotgun query results keyed by (entity_type, entity_id, fields), shared by
+        # the menu, the open file callback and any callers of the sync API.
+        self._editorial_cache = {}
+
+        # Limits and coalesces the requests this session sends to Shotgun so that a studio
+        # full of sessions opening scenes at once doesn't trip the site's rate limits.
+        self._shotgun_throttle = self._tk_multi_setframerange.RequestThrottle(
+            self.get_setting("sg_request_rate"), self.get_setting("sg_request_burst")
+        )
+        # The throttle is per session, so the first scene open also waits a random moment
+        # to spread the sessions started together at the beginning of a shift.
+        self._open_delay_pending = True
+
+        # Optionally share editorial data with the user's other sessions through a local service.
+        self._editorial_service = None
+        self._editorial_client = None
+        self._editorial_service_attempt = None
+        if self.get_setting("use_editorial_service"):
+            self._init_editorial_service()
+
+        # Index of the edit file, created on first use when 'editorial_source' is 'edit_file'.
+        self._edit_index = None
+
         # We grab the menu name from the settings so that the user is able to register multiple instances
         # of this app with different frame range fields configured.
         self.engine.register_command(self.get_setting("menu_name"), self.run_app)
@@ -61,10 +92,18 @@ class SetEditData(Application):
         App teardown
         """
         self.logger.debug("Destroying sg_set_editorial_data")
+        self.logger.debug("Shotgun requests: %s" % self.shotgun_request_stats)
 
         # Unset the open_file_callback.
         self.unset_open_file_callback(self.update_callback, self.call)
 
+        if self._editorial_client:
+            self._editorial_client.close()
+        if self._editorial_service:
+            self._editorial_service.stop()
+        if self._edit_index:
+            self._edit_index.close()
+
     def run_app(self):
         """
         Callback from when the menu is clicked.
@@ -76,14 +115,16 @@ class SetEditData(Application):
             queried data and popup a QMessageBox with results.
 
         """
+        from tank.platform.qt import QtGui
+
         try:
-            update_data = self._check_current_file()
+            update_data = self._check_current_file(refresh=True)
 
             if update_data:
                 self._update_dialog(*update_data)
             else:
                 message = "Your workfile is up to date with the \n"
-                message += "latest editorial data in Shotgun."
+                message += "latest editorial data in %s." % self._editorial_source_name()
                 QtGui.QMessageBox.information(None, "You're all good!", message)
                 return
 
@@ -93,10 +134,144 @@ class SetEditData(Application):
             error_message = traceback.format_exc()
             self.logger.error(error_message)
 
+    ###############################################################################################
+    # public sync api
+    #
+    # None of these import Qt so they can be called by other apps and scripts without a UI.
+
+    def get_sync_plan(self, context=None, refresh=False):
+        """
+        get_sync_plan will compare the editorial data for the entity of `context`, read from
+            the 'editorial_source', with the editorial data of the current scene.
+
+        Shotgun results are cached by the app, so this is cheap to call repeatedly.
+
+        :param context: The context to read the editorial data for. Defaults to the app's context.
+        :param bool refresh: Query Shotgun again rather than using the cached values.
+        :returns: The immutable result of the comparison.
+        :rtype: SyncPlan
+        :raises: tank.TankError
+        """
+        context = context or self.context
+        shotgun_edit_data = self.get_editorial_data(context=context, refresh=refresh)
+        current_edit_data = self.get_current_editorial_data()
+        return self._tk_multi_setframerange.build_sync_plan(
+            context.entity, shotgun_edit_data, current_edit_data
+        )
+
+    def apply(self, plan):
+        """
+        apply will update the current scene with the Shotgun values of `plan`. Only the range
+            and/or rate that differ are passed to the hook.
+
+        :param SyncPlan plan: A plan returned by get_sync_plan.
+        :returns: True if the scene was updated, False if it was already in sync.
+        :rtype: bool
+        :raises: tank.TankError
+        """
+        if plan.in_sync:
+            return False
+        self.set_editorial_data(*plan.changes)
+        return True
+
+    @property
+    def shotgun_request_stats(self):
+        """
+        Counters of the Shotgun requests sent by the app: 'requests' sent, how many were
+            'throttled' by the rate limit, how many were 'coalesced' with an identical
+            request already in flight and how many were 'retried' after Shotgun rejected
+            them for rate limiting.
+
+        :rtype: dict
+        """
+        return self._shotgun_throttle.stats
+
+    def clear_cache(self):
+        """
+        clear_cache will forget all the editorial data previously read from Shotgun.
+        """
+        self._editorial_cache.clear()
+
     ###############################################################################################
     # implementation
 
-    def get_editorial_data_from_shotgun(self):
+    def get_editorial_data(self, context=None, refresh=False):
+        """
+        get_editorial_data will return the (in, out, frame_rate) editorial data for the entity
+            of `context` from the source set in the 'editorial_source' setting.
+
+        :param context: The context to get the data for. Defaults to the app's context.
+        :param bool refresh: Query Shotgun again rather than using the cached values.
+        :returns: Tuple of (in, out, frame_rate)
+        :rtype: tuple[int,int,float]
+        :raises: tank.TankError
+        """
+        editorial_source = self.get_setting("editorial_source")
+
+        if editorial_source == "shotgun":
+            return self.get_editorial_data_from_shotgun(context=context, refresh=refresh)
+        if editorial_source == "edit_file":
+            return self.get_editorial_data_from_edit_file(context=context)
+
+        raise tank.TankError(
+            "Configuration error: Unknown editorial_source '%s', expected "
+            "'shotgun' or 'edit_file'!" % editorial_source
+        )
+
+    def get_editorial_data_from_edit_file(self, context=None):
+        """
+        get_editorial_data_from_edit_file will look up the entity of `context` by name in the
+            EDL or OpenTimelineIO file set in the 'edit_file_path' setting and return a
+            tuple of (in, out, frame_rate). Shotgun is not queried at all.
+
+        The edit is indexed the first time it is read and again whenever it changes on disk.
+
+        :param context: The context to get the data for. Defaults to the app's context.
+        :returns: Tuple of (in, out, frame_rate)
+        :rtype: tuple[int,int,float]
+        :raises: tank.TankError
+        """
+        context = context or self.context
+        entity = context.entity
+
+        if entity is None:
+            raise tank.TankError("Context %s does not have an entity!" % context)
+
+        edit_file_path = os.path.expandvars(os.path.expanduser(self.get_setting("edit_file_path")))
+        if not edit_file_path:
+            raise tank.TankError("Configuration error: 'edit_file_path' is not set!")
+
+        try:
+            data = self._get_edit_index(edit_file_path).get(entity["name"])
+        except Exception as err:
+            error_message = traceback.format_exc()
+            self.logger.error(error_message)
+            raise tank.TankError("Encountered an error while reading the edit: {}".format(str(err)))
+
+        if data is None:
+            raise tank.TankError("%s %s is not in the edit %s" % (entity["type"], entity["name"], edit_file_path))
+
+        return data
+
+    def _get_edit_index(self, edit_file_path):
+        """
+        _get_edit_index will return the index of `edit_file_path`, kept in the app's cache location.
+
+        :rtype: EditIndex
+        """
+        if self._edit_index is None or self._edit_index.source_path != edit_file_path:
+            if self._edit_index:
+                self._edit_index.close()
+            index_name = hashlib.md5(edit_file_path.encode("utf-8")).hexdigest()
+            self._edit_index = self._tk_multi_setframerange.EditIndex(
+                edit_file_path,
+                os.path.join(self.cache_location, "edit_index", index_name),
+                self.get_setting("edit_file_start_frame"),
+                self.get_setting("edit_file_frame_rate"),
+            )
+        return self._edit_index
+
+    def get_editorial_data_from_shotgun(self, context=None, refresh=False):
         """
         get_editorial_data_from_shotgun will query shotgun for the
             'sg_in_frame_field', 'sg_out_frame_field', 'sg_frame_rate_field'
@@ -105,23 +280,27 @@ class SetEditData(Application):
         If the fields specified in the settings do not exist in your Shotgun site, this will raise
             a tank.TankError letting you know which field is missing.
 
+        :param context: The context to query the data for. Defaults to the app's context.
+        :param bool refresh: Query Shotgun again rather than using the cached values.
         :returns: Tuple of (in, out, frame_rate)
         :rtype: tuple[int,int,float]
         :raises: tank.TankError
         """
-        # we know that this exists now (checked in init)
-        entity = self.context.entity
-        project = self.context.project
+        context = context or self.context
+        entity = context.entity
+        project = context.project
 
-        sg_entity_type = self.context.entity["type"]
-        sg_filters = [["id", "is", entity["id"]]]
+        if entity is None:
+            raise tank.TankError("Context %s does not have an entity!" % context)
+
+        sg_entity_type = entity["type"]
 
         sg_in_field = self.get_setting("sg_in_frame_field")
         sg_out_field = self.get_setting("sg_out_frame_field")
         sg_frame_rate_field = self.get_setting("sg_frame_rate_field")
         fields = [sg_in_field, sg_out_field, sg_frame_rate_field]
 
-        data = self.shotgun.find_one(sg_entity_type, filters=sg_filters, fields=fields)
+        data = self._find_one(sg_entity_type, entity["id"], fields, project_id=project["id"], refresh=refresh)
 
         # check if fields exist!
         if sg_in_field not in data:
@@ -139,7 +318,7 @@ class SetEditData(Application):
             )
 
         if not data.get(sg_frame_rate_field):
-            proj_data = self.shotgun.find_one("Project", filters=[["id", "is", project["id"]]], fields=fields)
+            proj_data = self._find_one("Project", project["id"], fields, project_id=project["id"], refresh=refresh)
             if sg_frame_rate_field not in proj_data:
                 data[sg_frame_rate_field] = None
             else:
@@ -147,6 +326,105 @@ class SetEditData(Application):
 
         return (data[sg_in_field], data[sg_out_field], data[sg_frame_rate_field])
 
+    def _find_one(self, entity_type, entity_id, fields, project_id=None, refresh=False):
+        """
+        _find_one will return the `fields` of a Shotgun entity, using the app's cache
+            unless `refresh` is set.
+
+        The data is read from the local editorial service when it is enabled, and straight
+            from Shotgun when it isn't or it can't be reached. The service keeps its data up
+            to date itself, so it is asked every time rather than the app's cache.
+
+        :returns: A copy of the Shotgun data so callers are free to modify it.
+        :rtype: dict
+        """
+        key = (entity_type, entity_id, tuple(fields))
+        if self._editorial_client or refresh or key not in self._editorial_cache:
+            self._editorial_cache[key] = self._query_shotgun(key, project_id, refresh=refresh)
+        data = self._editorial_cache[key]
+        return dict(data) if data is not None else None
+
+    def _query_shotgun(self, key, project_id, refresh=False):
+        """
+        _query_shotgun will send the (entity_type, entity_id, fields) `key` query to the
+            editorial service, or to Shotgun if the service is not available.
+
+        When the service can't be reached, for example because the session running it was
+            closed, this session tries to take it over and asks the new service once more.
+
+        :rtype: dict
+        """
+        (entity_type, entity_id, fields) = key
+
+        if self._editorial_client:
+            for retry in (True, False):
+                try:
+                    return self._editorial_client.find_one(
+                        entity_type, entity_id, fields, project_id=project_id, refresh=refresh
+                    )
+                except self._tk_multi_setframerange.EditorialServiceError as err:
+                    self.logger.debug("Editorial service query failed: %s" % err)
+                if not (retry and self._start_editorial_service()):
+                    break
+            self.logger.debug("Falling back to Shotgun.")
+
+        return self._shotgun_throttle.call(
+            key, self.shotgun.find_one, entity_type, filters=[["id", "is", entity_id]], fields=list(fields)
+        )
+
+    def _init_editorial_service(self):
+        """
+        _init_editorial_service will connect to the user's editorial service, starting it in
+            this session if no other session is running it yet.
+        """
+        editorial_service = self._tk_multi_setframerange.editorial_service
+        if not editorial_service.is_supported():
+            self.logger.debug("The editorial service is not supported on this platform.")
+            return
+
+        socket_path = self.get_setting("editorial_service_socket") or editorial_service.default_socket_path()
+        self._editorial_client = editorial_service.EditorialClient(socket_path)
+        self._start_editorial_service()
+
+    def _start_editorial_service(self):
+        """
+        _start_editorial_service will start the editorial service in this session unless it
+            is running already, here or in another session. Attempts are at least
+            EDITORIAL_SERVICE_RETRY_DELAY seconds apart.
+
+        :returns: True if this session started the service.
+        :rtype: bool
+        """
+        if self._editorial_service:
+            return False
+
+        now = time.time()
+        if self._editorial_service_attempt and now - self._editorial_service_attempt < EDITORIAL_SERVICE_RETRY_DELAY:
+            return False
+        self._editorial_service_attempt = now
+
+        editorial_service = self._tk_multi_setframerange.editorial_service
+        try:
+            # the service gets its own connection as it answers from other threads, it is
+            # only created if this session ends up running the service
+            self._editorial_service = editorial_service.EditorialService.create(
+                tank.util.shotgun.create_sg_connection,
+                self._editorial_client.socket_path,
+                ttl=self.get_setting("editorial_service_ttl"),
+                throttle=self._shotgun_throttle,
+            )
+        except Exception:
+            error_message = traceback.format_exc()
+            self.logger.error(error_message)
+            return False
+
+        if not self._editorial_service:
+            return False
+
+        self.logger.debug("Starting the editorial service on %s" % self._editorial_client.socket_path)
+        self._editorial_service.start()
+        return True
+
     def get_current_editorial_data(self):
         """
         get_current_frame_range will execute the hook specified in the 'hook_frame_operation'
@@ -215,34 +493,13 @@ class SetEditData(Application):
                 )
             )
 
-    def _check_current_file(self):
-
-        shotgun_edit_data = self.get_editorial_data_from_shotgun()
-        current_edit_data = self.get_current_editorial_data()
-
-        # something might need updating, lets get into it
-        if shotgun_edit_data != current_edit_data:
-
-            update_range = True
-            update_rate = True
+    def _check_current_file(self, refresh=False):
 
-            (new_in, new_out, new_rate) = shotgun_edit_data
-            (current_in, current_out, current_rate) = current_edit_data
+        plan = self.get_sync_plan(refresh=refresh)
 
-            # If the current range matches the new range or
-            # either value in the new range is not set, we can skip
-            if (new_in, new_out) == (current_in, current_out) or new_in is None or new_out is None:
-                update_range = False
-
-            # If the current_rate matches the new_rate or
-            # the new_rate is not set, we dont need to set it
-            if (new_rate == current_rate) or new_rate is None:
-                update_rate = False
-
-            if update_range or update_rate:
-                return shotgun_edit_data, current_edit_data, update_range, update_rate
-            else:
-                return False
+        if plan.in_sync:
+            return False
+        return plan.shotgun, plan.current, plan.update_range, plan.update_rate
 
     def set_open_file_callback(self, func=None):
         """
@@ -300,7 +557,18 @@ class SetEditData(Application):
                 )
             )
 
+    def _editorial_source_name(self):
+        """
+        _editorial_source_name will return how the 'editorial_source' is called in messages.
+
+        :rtype: str
+        """
+        if self.get_setting("editorial_source") == "edit_file":
+            return "the edit %s" % os.path.basename(self.get_setting("edit_file_path"))
+        return "Shotgun"
+
     def _update_dialog(self, shotgun_edit_data, current_edit_data, update_range=True, update_rate=True):
+        from tank.platform.qt import QtGui
 
         (new_in, new_out, new_rate) = shotgun_edit_data
         (current_in, current_out, current_rate) = current_edit_data
@@ -308,7 +576,7 @@ class SetEditData(Application):
         if update_range or update_rate:
 
             message = "Your workfile has does not match \n"
-            message += "the latest editorial data in Shotgun.\n\n"
+            message += "the latest editorial data in %s.\n\n" % self._editorial_source_name()
             if update_range:
                 message += "Current start frame: %s\n" % current_in
                 message += "New start frame: %s\n\n" % new_in
@@ -326,11 +594,33 @@ class SetEditData(Application):
                                                   message,
                                                   flags)
             if response == QtGui.QMessageBox.Yes:
-                self.set_editorial_data(new_in, new_out, new_rate)
+                self.set_editorial_data(
+                    new_in if update_range else None,
+                    new_out if update_range else None,
+                    new_rate if update_rate else None,
+                )
 
     def update_callback(self):
+        # The first scene open of a session waits a random moment before querying Shotgun.
+        # It waits on a timer rather than sleeping so the DCC stays responsive meanwhile.
+        delay = self.get_setting("sg_open_request_delay") if self._open_delay_pending else 0
+        self._open_delay_pending = False
+        if delay > 0 and self.engine.has_ui:
+            from tank.platform.qt import QtCore
+
+            QtCore.QTimer.singleShot(int(random.uniform(0, delay) * 1000), self._update_current_file)
+            return
+
+        self._update_current_file()
+
+    def _update_current_file(self):
+        """
+        Checks the current file against the editorial data and offers to update it.
+        """
         try:
-            update_data = self._check_current_file()
+            # with the editorial service the data is as fresh as its ttl, only the menu
+            # makes it read Shotgun again
+            update_data = self._check_current_file(refresh=not self._editorial_client)
 
             if update_data:
                 self._update_dialog(*update_data)
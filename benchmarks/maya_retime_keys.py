@@ -0,0 +1,102 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Benchmark for changing the frame rate of a heavily keyed Maya scene.
+
+Builds a synthetic scene of 100k keys spread over many lightly keyed curves, like a
+crowd or character scene, including keys at negative frames for pre-roll. It times a
+24 -> 25 fps change using Maya's `keepKeysAtCurrentFrame` against the app's bulk retime,
+and checks that the retime is undone in one step. It prints the timings and checks
+in a form ready to paste in a commit message. Run it from the script editor
+of a Maya session where the app is loaded:
+
+    exec(open("/path/to/tk-multi-setframerange/benchmarks/maya_retime_keys.py").read())
+
+"""
+import time
+
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
+import maya.cmds as cmds
+
+import sgtk
+
+CURVE_COUNT = 20000
+KEYS_PER_CURVE = 5
+FIRST_FRAME = -20
+FRAME_STEP = 10
+
+
+def build_scene():
+    """
+    Creates CURVE_COUNT animated transforms with KEYS_PER_CURVE keys each at 24fps.
+    """
+    cmds.file(new=True, force=True)
+    cmds.currentUnit(t="film")
+
+    frames = [FIRST_FRAME + key * FRAME_STEP for key in range(KEYS_PER_CURVE)]
+    times = om.MTimeArray([om.MTime(float(frame), om.MTime.kFilm) for frame in frames])
+    values = om.MDoubleArray([float(frame % 7) for frame in frames])
+
+    attributes = ["translateX", "translateY", "translateZ", "rotateX", "rotateY", "rotateZ"]
+    for index in range(CURVE_COUNT):
+        if index % len(attributes) == 0:
+            node = cmds.createNode("transform", name="bench%d" % index)
+        attribute = attributes[index % len(attributes)]
+        plug = om.MSelectionList().add("%s.%s" % (node, attribute)).getPlug(0)
+        curve = oma.MFnAnimCurve()
+        curve.create(plug, oma.MFnAnimCurve.kAnimCurveTL)
+        curve.addKeys(times, values)
+
+
+def key_frames():
+    """
+    Returns the frame of every key in the scene in the current unit, rounded to avoid
+    floating point noise from the unit change.
+    """
+    return sorted(round(frame, 3) for frame in cmds.keyframe("bench*", query=True, timeChange=True) or [])
+
+
+def check(results, name, passed):
+    """
+    Records the outcome of a check and stops the benchmark when it failed.
+    """
+    results.append("%s: %s" % (name, "passed" if passed else "FAILED"))
+    assert passed, name
+
+
+def run(app):
+    results = []
+
+    build_scene()
+    expected = key_frames()
+    start = time.time()
+    cmds.optionVar(iv=("keepKeysAtCurrentFrame", 1))
+    cmds.currentUnit(t="25fps")
+    results.append("keepKeysAtCurrentFrame: %.2fs" % (time.time() - start))
+    check(results, "keepKeysAtCurrentFrame keeps the keys on their frames", key_frames() == expected)
+
+    build_scene()
+    start = time.time()
+    app.execute_hook_method("hook_frame_operation", "set_frame_rate_with_retime", maya_frame_rate=25)
+    results.append("bulk retime: %.2fs" % (time.time() - start))
+    check(results, "bulk retime keeps the keys on their frames", key_frames() == expected)
+    check(results, "bulk retime sets 25fps", cmds.currentUnit(query=True, time=True) == "pal")
+
+    cmds.undo()
+    check(results, "one undo restores the frame rate", cmds.currentUnit(query=True, time=True) == "film")
+    check(results, "one undo restores the keys", key_frames() == expected)
+
+    print("Maya %s, %d keys on %d curves" % (cmds.about(version=True), len(expected), CURVE_COUNT))
+    print("\n".join(results))
+
+
+run(sgtk.platform.current_engine().apps["tk-multi-setframerange"])
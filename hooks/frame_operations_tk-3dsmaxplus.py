@@ -50,6 +50,10 @@ class FrameOperation(HookBaseClass):
 
         """
 
+        # the frame rate is not supported yet, so there's only something to do for the range
+        if not (in_frame and out_frame):
+            return
+
         ticks = MaxPlus.Core.EvalMAXScript("ticksperframe").GetInt()
         range = MaxPlus.Interval(in_frame * ticks, out_frame * ticks)
         MaxPlus.Animation.SetRange(range)
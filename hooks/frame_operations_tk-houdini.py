@@ -48,6 +48,10 @@ class FrameOperation(HookBaseClass):
 
         """
 
+        # the frame rate is not supported yet, so there's only something to do for the range
+        if not (in_frame and out_frame):
+            return
+
         # We have to use hscript until SideFX gets around to implementing hou.setGlobalFrameRange()
         hou.hscript("tset `((%s-1)/$FPS)` `(%s/$FPS)`" % (in_frame, out_frame))
         hou.playbar.setPlaybackRange(in_frame, out_frame)
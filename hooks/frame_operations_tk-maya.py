@@ -8,6 +8,8 @@
 # agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
 # not expressly granted therein are reserved by Shotgun Software Inc.
 
+import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
 import maya.cmds as cmds
 import pymel.core as pm
 
@@ -55,15 +57,18 @@ class FrameOperation(HookBaseClass):
 
         # set frame rate for plackback
         if frame_rate:
-            # setting these prefs ensures that keys stay on thier frames
-            cmds.optionVar(iv=('keepKeysAtCurrentFrame', 1))
-            cmds.optionVar(iv=('roundRangesToWholeValue', 0))
-
             # maya only supports a set list of frame rates so lets find the closest one to ours
             maya_frame_rate = self.closest_match(_maya_valid_fps, frame_rate)
 
-            # and finally set the frame rate
-            cmds.currentUnit(t="{}fps".format(maya_frame_rate))
+            if self.parent.get_setting("retime_keys_on_rate_change"):
+                self.set_frame_rate_with_retime(maya_frame_rate)
+            else:
+                # setting these prefs ensures that keys stay on thier frames
+                cmds.optionVar(iv=('keepKeysAtCurrentFrame', 1))
+                cmds.optionVar(iv=('roundRangesToWholeValue', 0))
+
+                # and finally set the frame rate
+                cmds.currentUnit(t="{}fps".format(maya_frame_rate))
 
         # set frame data for plackback
         if in_frame and out_frame:
@@ -78,5 +83,76 @@ class FrameOperation(HookBaseClass):
             cmds.setAttr("defaultRenderGlobals.startFrame", in_frame)
             cmds.setAttr("defaultRenderGlobals.endFrame", out_frame)
 
+    def set_frame_rate_with_retime(self, maya_frame_rate):
+        """
+        set_frame_rate_with_retime will set the frame rate to `maya_frame_rate` while
+        keeping every key on the frame it was on before the change.
+
+        Rather than letting Maya rescale each animCurve as the time unit changes, all
+        time based animCurves are collected once through the API, the unit is changed
+        without touching them and they are then put back on their frames with a single
+        `scaleKey` around frame 0. On heavy scenes this is much faster than relying on
+        `keepKeysAtCurrentFrame`. The whole change is one undo step.
+
+        :param float maya_frame_rate: A frame rate from the list of rates Maya supports.
+        """
+        old_fps = pm.mel.currentTimeUnitToFPS()
+        if self.closest_match(_maya_valid_fps, old_fps) == maya_frame_rate:
+            return
+
+        (curves, sample) = self._collect_time_anim_curves()
+
+        cmds.undoInfo(openChunk=True, chunkName="set_frame_rate_with_retime")
+        try:
+            # let maya change the unit without touching any of the curves
+            cmds.optionVar(iv=('roundRangesToWholeValue', 0))
+            cmds.currentUnit(t="{}fps".format(maya_frame_rate), updateAnimation=False)
+
+            # rather than assuming where the keys ended up, measure how far a key at a
+            # frame other than 0 moved and scale every curve back by that much around
+            # frame 0, which puts keys at negative and positive frames back in one go
+            if sample:
+                (curve, index, frame) = sample
+                moved_to = cmds.keyframe(curve, index=(index, index), query=True, timeChange=True)[0]
+                if moved_to != frame:
+                    cmds.scaleKey(curves, timeScale=frame / moved_to, timePivot=0)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def _collect_time_anim_curves(self):
+        """
+        _collect_time_anim_curves will return the names of every animCurve in the scene
+        that is driven by time, along with a key used to measure how the unit change moved
+        them. Driven key curves (animCurveU*) are skipped as their inputs are not affected
+        by the frame rate.
+
+        :returns: Tuple of (curve names, (curve name, key index, frame) or None when no key
+            is on a frame other than 0)
+        :rtype: tuple[list[str], tuple]
+        """
+        curves = []
+        sample = None
+        iterator = om.MItDependencyNodes(om.MFn.kAnimCurve)
+        while not iterator.isDone():
+            curve = oma.MFnAnimCurve(iterator.thisNode())
+            if curve.isTimeInput and curve.numKeys:
+                curves.append(curve.name())
+                if sample is None:
+                    sample = self._sample_key(curve.name())
+            iterator.next()
+        return (curves, sample)
+
+    def _sample_key(self, curve):
+        """
+        _sample_key will return the first key of `curve` that is not on frame 0.
+
+        :returns: Tuple of (curve name, key index, frame) or None
+        """
+        frames = cmds.keyframe(curve, query=True, timeChange=True) or []
+        for (index, frame) in enumerate(frames):
+            if frame:
+                return (curve, index, frame)
+        return None
+
     def closest_match(self, lst, val):
         return lst[min(range(len(lst)), key=lambda i: abs(lst[i] - val))]
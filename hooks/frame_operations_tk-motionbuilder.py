@@ -50,6 +50,10 @@ class FrameOperation(HookBaseClass):
 
         """
 
+        # the frame rate is not supported yet, so there's only something to do for the range
+        if not (in_frame and out_frame):
+            return
+
         lPlayer = FBPlayerControl()
         lPlayer.LoopStart = FBTime(0, 0, 0, in_frame)
         lPlayer.LoopStop = FBTime(0, 0, 0, out_frame)
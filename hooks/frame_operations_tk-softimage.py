@@ -51,6 +51,10 @@ class FrameOperation(HookBaseClass):
 
         """
 
+        # the frame rate is not supported yet, so there's only something to do for the range
+        if not (in_frame and out_frame):
+            return
+
         Application = win32com.client.Dispatch("XSI.Application")
 
         # set playback control
@@ -0,0 +1,15 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+from . import editorial_service
+from .edit_index import EditIndex, EditIndexError
+from .editorial_service import EditorialServiceError
+from .sync_plan import EditorialData, Entity, SyncPlan, build_sync_plan
+from .throttle import RequestThrottle
@@ -0,0 +1,376 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Editorial data read from an EDL or OpenTimelineIO file rather than from Shotgun.
+
+The edit is parsed once into an index of (in, out, frame_rate) records keyed by shot
+name. The index is saved next to the app's cache as an open addressing hash table that
+is memory mapped when loaded, so lookups don't read or parse anything. It is rebuilt
+whenever the modification time of the edit changes. Every version of the edit gets its
+own index file, so an index other sessions have mapped is never replaced, which Windows
+does not allow.
+
+Index layout, little endian:
+
+    header:  magic, source mtime, source size, start frame, frame rate, slot count
+    slots:   name hash, name offset, name length, in, out, frame rate
+    names:   utf-8 shot names referenced by the slots
+"""
+import glob
+import hashlib
+import mmap
+import os
+import re
+import struct
+
+_MAGIC = b"TKEDIDX1"
+_HEADER = struct.Struct("<8sdqidI")
+_SLOT = struct.Struct("<QIHiid")
+
+_FNV_OFFSET = 0xCBF29CE484222325
+_FNV_PRIME = 0x100000001B3
+
+_EDL_EVENT = re.compile(
+    r"^\d+\s+\S+\s+(\S+)\s+\S+\s+(?:\d+\s+)?"
+    r"(\d\d[:;]\d\d[:;]\d\d[:;]\d\d)\s+(\d\d[:;]\d\d[:;]\d\d[:;]\d\d)\s+"
+    r"(\d\d[:;]\d\d[:;]\d\d[:;]\d\d)\s+(\d\d[:;]\d\d[:;]\d\d[:;]\d\d)\s*$"
+)
+_EDL_CLIP_NAME = re.compile(r"^\*\s*FROM CLIP NAME:\s*(.+?)\s*$", re.IGNORECASE)
+_EDL_LOCATOR = re.compile(r"^\*\s*LOC:\s*\S+\s+\S+\s+(.+?)\s*$", re.IGNORECASE)
+_EDL_FCM = re.compile(r"^FCM:\s*(.+?)\s*$", re.IGNORECASE)
+
+# frames dropped at the start of every minute but every tenth, by nominal frame rate
+_DROPPED_FRAMES = {30: 2, 60: 4}
+
+
+class EditIndexError(Exception):
+    """
+    Raised when an edit can't be read.
+    """
+
+
+def _hash(name):
+    """
+    64 bit FNV-1a hash of `name`, stable across processes unlike hash().
+    """
+    value = _FNV_OFFSET
+    for byte in bytearray(name):
+        value = ((value ^ byte) * _FNV_PRIME) & 0xFFFFFFFFFFFFFFFF
+    return value
+
+
+def _timecode_to_frames(timecode, frame_rate, drop_frame=False):
+    """
+    _timecode_to_frames will convert an HH:MM:SS:FF timecode to a frame count. Drop frame
+        timecodes are the ones using ';' as a separator, or all of them with `drop_frame`.
+
+    :raises: EditIndexError
+    """
+    fps = int(round(frame_rate))
+    hours, minutes, seconds, frames = [int(value) for value in re.split(r"[:;]", timecode)]
+    count = ((hours * 60 + minutes) * 60 + seconds) * fps + frames
+
+    if drop_frame or ";" in timecode:
+        if fps not in _DROPPED_FRAMES:
+            raise EditIndexError("Drop frame timecode %s can't be used at %s fps" % (timecode, frame_rate))
+        total_minutes = hours * 60 + minutes
+        count -= _DROPPED_FRAMES[fps] * (total_minutes - total_minutes // 10)
+    return count
+
+
+def _extent_length(ranges):
+    """
+    _extent_length will return the number of frames from the first start to the last end
+        of a list of (start, end) ranges, so a plate covers every part of it that is used.
+    """
+    return max(end for (start, end) in ranges) - min(start for (start, end) in ranges)
+
+
+def _is_video_track(track):
+    """
+    _is_video_track will check if the track field of an EDL event has picture, V tracks
+        and B for events with both picture and sound.
+    """
+    return track.upper().startswith("V") or track.upper() == "B"
+
+
+def parse_edl(path, frame_rate):
+    """
+    parse_edl will read the duration of every shot of a CMX3600 EDL.
+
+    Only events with picture are read, named after their locator if they have one and
+        otherwise after their clip name. A shot cut in more than once lasts from the first
+        to the last source frame it uses.
+
+    :param str path: Path to the EDL.
+    :param float frame_rate: Frame rate of the EDL, EDLs don't record it themselves.
+    :returns: Dictionary of {shot name: (duration, frame_rate)}
+    :rtype: dict
+    :raises: EditIndexError
+    """
+    source_ranges = {}
+
+    def add_event(event, name):
+        if event and name:
+            source_ranges.setdefault(name, []).append(event)
+
+    event = None
+    clip_name = locator = None
+    drop_frame = False
+    with open(path, "r") as edl:
+        for line in edl:
+            line = line.strip()
+            match = _EDL_EVENT.match(line)
+            if match:
+                add_event(event, locator or clip_name)
+                event = None
+                if _is_video_track(match.group(1)):
+                    event = (
+                        _timecode_to_frames(match.group(2), frame_rate, drop_frame),
+                        _timecode_to_frames(match.group(3), frame_rate, drop_frame),
+                    )
+                clip_name = locator = None
+                continue
+
+            match = _EDL_FCM.match(line)
+            if match:
+                drop_frame = match.group(1).upper().replace("-", " ") == "DROP FRAME"
+                continue
+
+            match = _EDL_LOCATOR.match(line)
+            if match:
+                locator = match.group(1)
+                continue
+
+            match = _EDL_CLIP_NAME.match(line)
+            if match:
+                clip_name = match.group(1)
+    add_event(event, locator or clip_name)
+
+    return dict((name, (_extent_length(ranges), frame_rate)) for (name, ranges) in source_ranges.items())
+
+
+def parse_otio(path):
+    """
+    parse_otio will read the duration of every clip of the video tracks of a timeline with
+        OpenTimelineIO, which needs to be installed. Clips sharing a name are merged like
+        parse_edl does.
+
+    :param str path: Path to any file OpenTimelineIO can read.
+    :returns: Dictionary of {shot name: (duration, frame_rate)}
+    :rtype: dict
+    """
+    try:
+        import opentimelineio as otio
+    except ImportError:
+        raise EditIndexError("OpenTimelineIO is required to read %s" % path)
+
+    timeline = otio.adapters.read_from_file(path)
+
+    source_ranges = {}
+    rates = {}
+    for track in timeline.video_tracks():
+        clips = track.find_clips() if hasattr(track, "find_clips") else track.each_clip()
+        for clip in clips:
+            source_range = clip.trimmed_range()
+            start = int(round(source_range.start_time.value))
+            source_ranges.setdefault(clip.name, []).append(
+                (start, start + int(round(source_range.duration.value)))
+            )
+            rates.setdefault(clip.name, float(source_range.duration.rate))
+
+    return dict((name, (_extent_length(ranges), rates[name])) for (name, ranges) in source_ranges.items())
+
+
+def parse_edit(path, frame_rate):
+    """
+    parse_edit will read `path` with parse_edl for .edl files and parse_otio otherwise.
+
+    :rtype: dict
+    """
+    if os.path.splitext(path)[1].lower() == ".edl":
+        return parse_edl(path, frame_rate)
+    return parse_otio(path)
+
+
+def write_index(index_path, shots, source_mtime, source_size, start_frame, frame_rate):
+    """
+    write_index will save `shots` as an index with every shot starting on `start_frame`.
+
+    :param dict shots: Dictionary of {shot name: (duration, frame_rate)}
+    """
+    slot_count = 8
+    while slot_count < len(shots) * 2:
+        slot_count *= 2
+    mask = slot_count - 1
+
+    slots = [None] * slot_count
+    names = bytearray()
+    for (name, (duration, rate)) in shots.items():
+        # an empty name would read back as an empty slot
+        if not name:
+            continue
+        encoded = name.encode("utf-8")
+        name_hash = _hash(encoded)
+        slot = name_hash & mask
+        while slots[slot] is not None:
+            slot = (slot + 1) & mask
+        slots[slot] = _SLOT.pack(
+            name_hash, len(names), len(encoded), start_frame, start_frame + duration - 1, rate
+        )
+        names.extend(encoded)
+
+    empty = _SLOT.pack(0, 0, 0, 0, 0, 0.0)
+    directory = os.path.dirname(index_path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # write next to the index and move it in place so readers never see a partial file
+    temp_path = "%s.%d.tmp" % (index_path, os.getpid())
+    with open(temp_path, "wb") as index:
+        index.write(_HEADER.pack(_MAGIC, source_mtime, source_size, start_frame, frame_rate, slot_count))
+        for slot in slots:
+            index.write(slot or empty)
+        index.write(bytes(names))
+    try:
+        os.rename(temp_path, index_path)
+    except OSError:
+        # on Windows another session may have written the same index in the meantime
+        os.remove(temp_path)
+        if not os.path.exists(index_path):
+            raise
+
+
+class EditIndex(object):
+    """
+    Lookups of the editorial data of an edit by shot name.
+
+    :param str source_path: Path to the EDL or OpenTimelineIO file.
+    :param str index_prefix: Path the index files are saved to, without their extension.
+    :param int start_frame: Frame every shot starts on.
+    :param float frame_rate: Frame rate of the edit, used for EDLs.
+    """
+
+    def __init__(self, source_path, index_prefix, start_frame, frame_rate):
+        self.source_path = source_path
+        self.index_prefix = index_prefix
+        self._start_frame = int(start_frame)
+        self._frame_rate = float(frame_rate)
+        self._source_mtime = None
+        self._map = None
+        self._mask = 0
+        self._names_offset = 0
+
+    def get(self, name):
+        """
+        get will return the editorial data of shot `name`.
+
+        :returns: Tuple of (in, out, frame_rate) or None if the shot is not in the edit.
+        :rtype: tuple[int,int,float]
+        :raises: EditIndexError
+        """
+        self._load()
+
+        encoded = name.encode("utf-8")
+        name_hash = _hash(encoded)
+        slot = name_hash & self._mask
+        while True:
+            offset = _HEADER.size + slot * _SLOT.size
+            (slot_hash, name_offset, name_length, in_frame, out_frame, rate) = _SLOT.unpack_from(self._map, offset)
+            if not name_length:
+                return None
+            if slot_hash == name_hash:
+                start = self._names_offset + name_offset
+                if self._map[start:start + name_length] == encoded:
+                    return (in_frame, out_frame, rate)
+            slot = (slot + 1) & self._mask
+
+    def close(self):
+        """
+        close will unmap the index.
+        """
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._source_mtime = None
+
+    def _load(self):
+        """
+        _load will map the index, rebuilding it first if the edit has changed since.
+        """
+        try:
+            stat = os.stat(self.source_path)
+        except OSError as err:
+            raise EditIndexError("Can't read the edit %s: %s" % (self.source_path, err))
+
+        if self._map is not None and stat.st_mtime == self._source_mtime:
+            return
+        self.close()
+
+        index_path = self._index_path(stat)
+        if not self._open(index_path, stat):
+            shots = parse_edit(self.source_path, self._frame_rate)
+            write_index(index_path, shots, stat.st_mtime, stat.st_size, self._start_frame, self._frame_rate)
+            if not self._open(index_path, stat):
+                raise EditIndexError("Failed to build the edit index %s" % index_path)
+        self._remove_old_indexes(index_path)
+
+    def _index_path(self, stat):
+        """
+        _index_path will return the path of the index of this version of the edit.
+        """
+        version = repr((stat.st_mtime, stat.st_size, self._start_frame, self._frame_rate))
+        return "%s.%s.idx" % (self.index_prefix, hashlib.md5(version.encode("utf-8")).hexdigest()[:16])
+
+    def _remove_old_indexes(self, index_path):
+        """
+        _remove_old_indexes will delete the indexes of previous versions of the edit. The
+            ones other sessions still have mapped on Windows are left for later.
+        """
+        for old_path in glob.glob("%s.*.idx" % self.index_prefix):
+            if old_path != index_path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def _open(self, index_path, stat):
+        """
+        _open will map the index if it is up to date with the edit.
+
+        :returns: True if the index was mapped.
+        """
+        try:
+            with open(index_path, "rb") as index:
+                index_map = mmap.mmap(index.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, OSError, ValueError):
+            return False
+
+        if len(index_map) < _HEADER.size:
+            index_map.close()
+            return False
+
+        (magic, source_mtime, source_size, start_frame, frame_rate, slot_count) = _HEADER.unpack_from(index_map, 0)
+        if (magic, source_mtime, source_size, start_frame, frame_rate) != (
+            _MAGIC,
+            stat.st_mtime,
+            stat.st_size,
+            self._start_frame,
+            self._frame_rate,
+        ):
+            index_map.close()
+            return False
+
+        self._map = index_map
+        self._mask = slot_count - 1
+        self._names_offset = _HEADER.size + slot_count * _SLOT.size
+        self._source_mtime = stat.st_mtime
+        return True
@@ -0,0 +1,439 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+A per-user local service sharing editorial data between all the DCC sessions of a user.
+
+The service owns a single Shotgun connection and keeps the editorial fields of every
+entity of the active project in memory. Sessions query it over a Unix socket with one
+JSON document per line:
+
+    request:  {"entity_type": "Shot", "entity_id": 1, "fields": [...], "project_id": 2,
+               "refresh": false}
+    response: {"data": {...}} or {"error": "..."}
+
+The socket lives in a directory only the user can access, and both ends check that the
+other one is run by the same user. The backend only needs `find` and `find_one`, so a
+mockgun connection can be used in place of Shotgun.
+"""
+import errno
+import getpass
+import json
+import os
+import socket
+import stat
+import struct
+import tempfile
+import threading
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .throttle import RequestThrottle, clock
+
+
+def is_supported():
+    """
+    Unix sockets are not available on every platform.
+
+    :rtype: bool
+    """
+    return hasattr(socket, "AF_UNIX") and fcntl is not None
+
+
+def default_socket_path():
+    """
+    The per-user socket path used when none is configured, in XDG_RUNTIME_DIR when it is
+        set and in a directory of the temp directory otherwise.
+
+    :rtype: str
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        directory = os.path.join(runtime_dir, "tk-multi-setframerange")
+    else:
+        directory = os.path.join(tempfile.gettempdir(), "tk-multi-setframerange-%s" % getpass.getuser())
+    return os.path.join(directory, "editorial.sock")
+
+
+class EditorialServiceError(Exception):
+    """
+    Raised when the service can't be reached or fails to answer a request.
+    """
+
+
+def _secure_directory(directory):
+    """
+    _secure_directory will create `directory` readable by the current user only, or check
+        that it is if it already exists, so nobody else can bind or reach the socket.
+
+    :raises: EditorialServiceError
+    """
+    try:
+        os.makedirs(directory, 0o700)
+    except OSError as err:
+        if err.errno != errno.EEXIST:
+            raise EditorialServiceError("Can't create %s: %s" % (directory, err))
+
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise EditorialServiceError(
+            "%s must be a directory owned by and only accessible to the current user" % directory
+        )
+
+
+def _peer_uid(sock, socket_path):
+    """
+    _peer_uid will return the id of the user running the other end of `sock`, using the
+        peer credentials where the platform has them and the socket owner otherwise.
+    """
+    if hasattr(socket, "SO_PEERCRED"):
+        credentials = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return struct.unpack("3i", credentials)[1]
+    return os.stat(socket_path).st_uid
+
+
+class EditorialTable(object):
+    """
+    In-memory editorial data, loaded one (entity_type, project, fields) table at a time.
+
+    Tables are loaded from a background thread so requests never wait for a whole project.
+    Until a table is first loaded its entities are read from Shotgun one by one, and once
+    loaded a table past its ttl keeps answering while it is reloaded.
+
+    :param connect: Callable returning a Shotgun connection, or anything with the same
+        `find` and `find_one`. It is called once for the requests and once for the table
+        loads, the first time each needs Shotgun.
+    :param float ttl: Seconds after which a table is reloaded from Shotgun.
+    :param RequestThrottle throttle: Limits the requests sent to Shotgun.
+    """
+
+    def __init__(self, connect, ttl=60.0, throttle=None):
+        self._connect = connect
+        self._ttl = ttl
+        self._throttle = throttle or RequestThrottle(0, 1)
+        self._lock = threading.Lock()
+        # Shotgun connections are not thread safe so every call goes through the lock of
+        # its connection, and loads get their own so they never hold up a request
+        self._shotgun = {"request": None, "load": None}
+        self._shotgun_locks = {"request": threading.Lock(), "load": threading.Lock()}
+        self._tables = {}
+        self._loading = set()
+
+    def find_one(self, entity_type, entity_id, fields, project_id=None, refresh=False):
+        """
+        find_one will return the `fields` of an entity, like Shotgun's find_one with an id filter.
+
+        :param bool refresh: Read the entity from Shotgun rather than from the table.
+        :rtype: dict or None
+        """
+        fields = sorted(fields)
+        rows = self._table((entity_type, project_id, tuple(fields)))
+
+        with self._lock:
+            if rows is not None and entity_id in rows and not refresh:
+                return rows[entity_id]
+
+        # the table is still loading, or the entity was created since it was loaded
+        row = self._call(
+            "request",
+            ("find_one", entity_type, entity_id, tuple(fields)),
+            "find_one",
+            entity_type,
+            filters=[["id", "is", entity_id]],
+            fields=fields,
+        )
+        if rows is not None:
+            with self._lock:
+                rows[entity_id] = row
+        return row
+
+    def _table(self, key):
+        """
+        _table will return the rows of the table for `key`, or None until it is first loaded.
+            A table that is missing or past its ttl is loaded in the background.
+        """
+        with self._lock:
+            (loaded_at, rows) = self._tables.get(key, (None, None))
+            if rows is not None and clock() - loaded_at <= self._ttl:
+                return rows
+
+            if key not in self._loading:
+                self._loading.add(key)
+                thread = threading.Thread(target=self._reload, args=(key,), name="EditorialTable")
+                thread.daemon = True
+                thread.start()
+        return rows
+
+    def _reload(self, key):
+        """
+        _reload will load the table for `key`. A failure leaves the old table in place and
+            the next request tries again.
+        """
+        loaded = None
+        try:
+            loaded = self._load(*key)
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                if loaded is not None:
+                    self._tables[key] = (clock(), loaded)
+                self._loading.discard(key)
+
+    def _load(self, entity_type, project_id, fields):
+        """
+        _load will read the `fields` of every entity of `entity_type` in the project.
+        """
+        if project_id is None or entity_type == "Project":
+            return {}
+        filters = [["project", "is", {"type": "Project", "id": project_id}]]
+        rows = self._call(
+            "load", ("find", entity_type, project_id, fields), "find", entity_type, filters=filters, fields=list(fields)
+        )
+        return dict((row["id"], row) for row in rows)
+
+    def _call(self, connection, key, method, *args, **kwargs):
+        """
+        _call will run `method` of the "request" or "load" Shotgun connection through the
+            throttle.
+        """
+        return self._throttle.call(key, self._call_locked, connection, method, args, kwargs)
+
+    def _call_locked(self, connection, method, args, kwargs):
+        with self._shotgun_locks[connection]:
+            if self._shotgun[connection] is None:
+                self._shotgun[connection] = self._connect()
+            return getattr(self._shotgun[connection], method)(*args, **kwargs)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """
+    Answers requests until the session closes its connection.
+    """
+
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        with self.server.connections_lock:
+            self.server.connections.add(self.connection)
+
+    def finish(self):
+        with self.server.connections_lock:
+            self.server.connections.discard(self.connection)
+        socketserver.StreamRequestHandler.finish(self)
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b""):
+            try:
+                request = json.loads(line.decode("utf-8"))
+                response = json.dumps(
+                    {
+                        "data": self.server.table.find_one(
+                            request["entity_type"],
+                            request["entity_id"],
+                            request["fields"],
+                            project_id=request.get("project_id"),
+                            refresh=request.get("refresh", False),
+                        )
+                    }
+                )
+            except Exception as err:
+                response = json.dumps({"error": str(err)})
+            self.wfile.write(response.encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class EditorialService(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves an EditorialTable over a Unix socket.
+
+    Use `create` rather than instantiating this directly, it takes care of other sessions
+    starting a service at the same time.
+
+    :param connect: Callable returning the Shotgun connection, see EditorialTable.
+    :param str socket_path: Path of the socket to listen on.
+    :param float ttl: Seconds after which the editorial data is reloaded from Shotgun.
+    :param RequestThrottle throttle: Limits the requests sent to Shotgun.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, connect, socket_path, ttl=60.0, throttle=None):
+        self.table = EditorialTable(connect, ttl=ttl, throttle=throttle)
+        self.socket_path = socket_path
+        # open connections, so they can be closed when the service stops
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+        socketserver.UnixStreamServer.__init__(self, socket_path, _RequestHandler)
+
+    def server_bind(self):
+        # create the socket without any access for other users rather than fixing it after
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+    def verify_request(self, request, client_address):
+        return _peer_uid(request, self.socket_path) == os.getuid()
+
+    def start(self):
+        """
+        start will serve requests from a daemon thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, name="EditorialService")
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        """
+        stop will stop serving, disconnect the sessions and remove the socket.
+        """
+        self.shutdown()
+        self.server_close()
+        with self.connections_lock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+    @classmethod
+    def create(cls, connect, socket_path, ttl=60.0, throttle=None):
+        """
+        create will start a service on `socket_path` unless another one is already answering
+            there, in which case it returns None. Sockets left behind by a service that is no
+            longer running are replaced.
+
+        Sessions go through a lock file so only one of them can replace a stale socket.
+
+        :rtype: EditorialService or None
+        :raises: EditorialServiceError
+        """
+        _secure_directory(os.path.dirname(socket_path))
+
+        with open(socket_path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    return cls(connect, socket_path, ttl=ttl, throttle=throttle)
+                except socket.error as err:
+                    if err.errno != errno.EADDRINUSE:
+                        raise
+
+                try:
+                    EditorialClient(socket_path).ping()
+                    return None
+                except EditorialServiceError:
+                    os.remove(socket_path)
+                    return cls(connect, socket_path, ttl=ttl, throttle=throttle)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class EditorialClient(object):
+    """
+    Queries an EditorialService, keeping the connection open between requests.
+
+    :param str socket_path: Path of the socket the service listens on.
+    :param float timeout: Seconds to wait for the service before giving up.
+    """
+
+    def __init__(self, socket_path, timeout=5.0):
+        self.socket_path = socket_path
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+
+    def find_one(self, entity_type, entity_id, fields, project_id=None, refresh=False):
+        """
+        find_one will return the `fields` of an entity from the service.
+
+        :param bool refresh: Have the service read the entity from Shotgun again.
+        :rtype: dict or None
+        :raises: EditorialServiceError
+        """
+        request = {
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "fields": list(fields),
+            "project_id": project_id,
+            "refresh": refresh,
+        }
+
+        with self._lock:
+            try:
+                self._connect()
+                self._socket.sendall(json.dumps(request).encode("utf-8") + b"\n")
+                line = self._file.readline()
+            except (socket.error, socket.timeout) as err:
+                self.close()
+                raise EditorialServiceError("Editorial service unavailable: %s" % err)
+
+            if not line:
+                self.close()
+                raise EditorialServiceError("Editorial service closed the connection")
+
+        response = json.loads(line.decode("utf-8"))
+        if "error" in response:
+            raise EditorialServiceError(response["error"])
+        return response["data"]
+
+    def ping(self):
+        """
+        ping will check that the service accepts connections.
+
+        :raises: EditorialServiceError
+        """
+        with self._lock:
+            try:
+                self._connect()
+            except (socket.error, socket.timeout) as err:
+                raise EditorialServiceError("Editorial service unavailable: %s" % err)
+            finally:
+                self.close()
+
+    def close(self):
+        """
+        close will close the connection to the service, the next request reconnects.
+        """
+        if self._file is not None:
+            self._file.close()
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = None
+        self._file = None
+
+    def _connect(self):
+        if self._socket is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self._timeout)
+            try:
+                sock.connect(self.socket_path)
+                # don't trust a service somebody else managed to start in our place
+                if _peer_uid(sock, self.socket_path) != os.getuid():
+                    raise EditorialServiceError("Editorial service %s is run by another user" % self.socket_path)
+            except Exception:
+                sock.close()
+                raise
+            self._socket = sock
+            self._file = sock.makefile("rb")
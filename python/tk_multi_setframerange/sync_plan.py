@@ -0,0 +1,114 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Immutable description of how the current scene compares to the editorial data in Shotgun.
+
+Nothing in here touches Qt so other apps and scripts can use it without a UI.
+"""
+from collections import namedtuple
+
+RANGE_FIELDS = ("in_frame", "out_frame")
+RATE_FIELDS = ("frame_rate",)
+
+
+class EditorialData(namedtuple("EditorialData", ["in_frame", "out_frame", "frame_rate"])):
+    """
+    A (in_frame, out_frame, frame_rate) tuple.
+    """
+
+    __slots__ = ()
+
+
+class Entity(namedtuple("Entity", ["type", "id", "name"])):
+    """
+    A (type, id, name) reference to a Shotgun entity.
+    """
+
+    __slots__ = ()
+
+
+class SyncPlan(namedtuple("SyncPlan", ["entity", "shotgun", "current", "fields"])):
+    """
+    The result of comparing the scene with Shotgun.
+
+    :ivar Entity entity: The Shotgun entity the editorial data was read from.
+    :ivar EditorialData shotgun: The editorial data stored in Shotgun.
+    :ivar EditorialData current: The editorial data of the current scene.
+    :ivar tuple fields: Names of the EditorialData fields that need updating in the scene.
+    """
+
+    __slots__ = ()
+
+    @property
+    def in_sync(self):
+        """
+        True if nothing in the scene needs updating.
+        """
+        return not self.fields
+
+    @property
+    def update_range(self):
+        """
+        True if the frame range in the scene needs updating.
+        """
+        return any(field in self.fields for field in RANGE_FIELDS)
+
+    @property
+    def update_rate(self):
+        """
+        True if the frame rate in the scene needs updating.
+        """
+        return any(field in self.fields for field in RATE_FIELDS)
+
+    @property
+    def changes(self):
+        """
+        The Shotgun values to set in the scene. The range is given as a whole when either
+            end of it differs, and everything that doesn't need updating is None.
+
+        :rtype: EditorialData
+        """
+        update_range = self.update_range
+        update_rate = self.update_rate
+        return EditorialData(
+            self.shotgun.in_frame if update_range else None,
+            self.shotgun.out_frame if update_range else None,
+            self.shotgun.frame_rate if update_rate else None,
+        )
+
+
+def build_sync_plan(entity, shotgun_edit_data, current_edit_data):
+    """
+    build_sync_plan will compare the editorial data from Shotgun with the data from the scene.
+
+    The range is only flagged when both the in and out frames are set in Shotgun, and the
+    rate is only flagged when it is set in Shotgun.
+
+    :param dict entity: The Shotgun entity the editorial data was read from, with at least
+        its type and id. The plan keeps it as an Entity.
+    :param tuple shotgun_edit_data: (in, out, frame_rate) from Shotgun.
+    :param tuple current_edit_data: (in, out, frame_rate) from the current scene.
+    :rtype: SyncPlan
+    """
+    shotgun = EditorialData(*shotgun_edit_data)
+    current = EditorialData(*current_edit_data)
+
+    fields = []
+
+    # If either value in the new range is not set, we can skip
+    if shotgun.in_frame is not None and shotgun.out_frame is not None:
+        fields.extend(field for field in RANGE_FIELDS if getattr(shotgun, field) != getattr(current, field))
+
+    # If the new_rate is not set, we dont need to set it
+    if shotgun.frame_rate is not None and shotgun.frame_rate != current.frame_rate:
+        fields.append("frame_rate")
+
+    return SyncPlan(Entity(entity["type"], entity["id"], entity.get("name")), shotgun, current, tuple(fields))
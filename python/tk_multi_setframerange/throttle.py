@@ -0,0 +1,180 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Client side limiting of the requests the app sends to Shotgun.
+
+When hundreds of sessions open scenes at the same time every one of them queries Shotgun
+at once. Requests are rate limited with a token bucket, waits are jittered so throttled
+sessions don't all retry in lockstep, and identical requests already in flight in this
+process share a single response. Requests Shotgun rejects because of its own rate limits
+are retried with jittered exponential backoff.
+"""
+import random
+import threading
+import time
+
+# wall clock jumps must not empty or overfill the bucket
+clock = getattr(time, "monotonic", time.time)
+
+# HTTP statuses Shotgun answers with when it is rate limiting or overloaded
+_RATE_LIMIT_STATUSES = (429, 503)
+
+
+def is_rate_limited(error):
+    """
+    is_rate_limited will check if `error` was raised because Shotgun rejected the request
+        for rate limiting, as opposed to a problem with the request itself.
+
+    :rtype: bool
+    """
+    if getattr(error, "errcode", None) in _RATE_LIMIT_STATUSES:
+        return True
+    message = str(error).lower()
+    return "rate limit" in message or "too many requests" in message
+
+
+class _InFlight(object):
+    """
+    A request that is currently being sent to Shotgun.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestThrottle(object):
+    """
+    Token bucket rate limiter with request coalescing.
+
+    :param float rate: Requests per second allowed on average. 0 disables rate limiting.
+    :param int burst: Number of requests that can be sent back to back before limiting starts.
+    :param int retries: Number of times a request rejected for rate limiting is sent again.
+    :param float backoff: Seconds to wait before the first retry, doubled for every retry after.
+    :param float max_backoff: Longest wait between two retries, in seconds.
+    """
+
+    def __init__(self, rate, burst, retries=5, backoff=0.5, max_backoff=30.0):
+        self._rate = float(rate or 0)
+        self._burst = max(int(burst or 1), 1)
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        self._tokens = float(self._burst)
+        self._last_refill = clock()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        self.requests = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    @property
+    def stats(self):
+        """
+        Counters of the requests that went through the throttle.
+
+        :rtype: dict
+        """
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "coalesced": self.coalesced,
+            "retried": self.retried,
+        }
+
+    def call(self, key, func, *args, **kwargs):
+        """
+        call will run `func(*args, **kwargs)` once a token is available and return its result.
+
+        If a call with the same `key` is already in flight, this waits for it and returns
+            its result (or raises its error) instead of sending another request.
+
+        :param key: A hashable key identifying the request, e.g. (entity_type, id, fields).
+        :param func: The function sending the request.
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                in_flight = self._in_flight[key] = _InFlight()
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.result
+
+        try:
+            in_flight.result = self._send(func, args, kwargs)
+            return in_flight.result
+        except Exception as err:
+            in_flight.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.done.set()
+
+    def _send(self, func, args, kwargs):
+        """
+        _send will call `func` once a token is available, retrying with backoff while
+            Shotgun rejects it for rate limiting.
+        """
+        attempt = 0
+        while True:
+            self._acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as err:
+                if attempt >= self._retries or not is_rate_limited(err):
+                    raise
+
+            with self._lock:
+                self.retried += 1
+            delay = min(self._max_backoff, self._backoff * 2 ** attempt)
+            attempt += 1
+
+            # wait at least half the delay, and a random part of the rest
+            time.sleep(delay / 2 + random.uniform(0, delay / 2))
+
+    def _acquire(self):
+        """
+        _acquire will block until a token is available and take it.
+        """
+        with self._lock:
+            self.requests += 1
+            if self._rate <= 0:
+                return
+
+        throttled = False
+        while True:
+            with self._lock:
+                now = clock()
+                self._tokens = min(self._burst, self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                if not throttled:
+                    self.throttled += 1
+                    throttled = True
+                wait = (1 - self._tokens) / self._rate
+
+            # jitter the wait so sessions throttled together don't come back together
+            time.sleep(wait + random.uniform(0, wait))
@@ -0,0 +1,157 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Tests of the edit file parsers and of the index they are saved to.
+"""
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(REPO_ROOT, "tests", "fixtures")
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+
+from tk_multi_setframerange import EditIndex, EditIndexError  # noqa
+from tk_multi_setframerange.edit_index import _timecode_to_frames, parse_edl, write_index  # noqa
+
+
+class TestTimecode(unittest.TestCase):
+    def test_non_drop_frame(self):
+        self.assertEqual(_timecode_to_frames("00:00:00:00", 24.0), 0)
+        self.assertEqual(_timecode_to_frames("00:00:02:02", 24.0), 50)
+        self.assertEqual(_timecode_to_frames("01:00:00:00", 25.0), 90000)
+
+    def test_drop_frame(self):
+        self.assertEqual(_timecode_to_frames("00:00:59;29", 29.97), 1799)
+        self.assertEqual(_timecode_to_frames("00:01:00;02", 29.97), 1800)
+        self.assertEqual(_timecode_to_frames("00:10:00;00", 29.97), 17982)
+        self.assertEqual(_timecode_to_frames("01:00:00;00", 29.97), 107892)
+        self.assertEqual(_timecode_to_frames("00:01:00;04", 59.94), 3600)
+
+    def test_drop_frame_from_fcm(self):
+        """
+        Timecodes using ':' are drop frame too when the EDL says so.
+        """
+        self.assertEqual(_timecode_to_frames("00:10:00:00", 29.97, drop_frame=True), 17982)
+
+    def test_drop_frame_needs_a_drop_frame_rate(self):
+        with self.assertRaises(EditIndexError):
+            _timecode_to_frames("00:01:00;02", 24.0)
+
+
+class TestParseEdl(unittest.TestCase):
+    def test_turnover(self):
+        shots = parse_edl(os.path.join(FIXTURES, "turnover.edl"), 24.0)
+        self.assertEqual(
+            shots,
+            {
+                # named after its locator rather than its clip, the audio event is ignored
+                "sh010": (20, 24.0),
+                # cut in twice, from 0 to 10 and from 50 to 60
+                "sh030": (60, 24.0),
+                # picture and sound
+                "sh040": (24, 24.0),
+                # a dissolve, with its duration field
+                "sh050": (24, 24.0),
+            },
+        )
+
+    def test_audio_only_shot_is_not_indexed(self):
+        self.assertNotIn("sh020", parse_edl(os.path.join(FIXTURES, "turnover.edl"), 24.0))
+
+    def test_drop_frame(self):
+        shots = parse_edl(os.path.join(FIXTURES, "drop_frame.edl"), 29.97)
+        self.assertEqual(shots, {"sh010": (2, 29.97), "sh020": (2, 29.97)})
+
+
+class TestEditIndex(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        self.edl_path = os.path.join(self.directory, "turnover.edl")
+        shutil.copy(os.path.join(FIXTURES, "turnover.edl"), self.edl_path)
+        self.index_prefix = os.path.join(self.directory, "index", "turnover")
+
+    def _index(self):
+        index = EditIndex(self.edl_path, self.index_prefix, 1001, 24.0)
+        self.addCleanup(index.close)
+        return index
+
+    def _index_files(self):
+        return glob.glob("%s.*.idx" % self.index_prefix)
+
+    def test_get(self):
+        index = self._index()
+        self.assertEqual(index.get("sh010"), (1001, 1020, 24.0))
+        self.assertEqual(index.get("sh030"), (1001, 1060, 24.0))
+        self.assertIsNone(index.get("sh020"))
+        self.assertIsNone(index.get("sh999"))
+        self.assertEqual(len(self._index_files()), 1)
+
+    def test_index_is_reused(self):
+        self._index().get("sh010")
+        (index_path,) = self._index_files()
+        modified = os.stat(index_path).st_mtime
+
+        self.assertEqual(self._index().get("sh030"), (1001, 1060, 24.0))
+        self.assertEqual(self._index_files(), [index_path])
+        self.assertEqual(os.stat(index_path).st_mtime, modified)
+
+    def test_rebuilt_when_the_edit_changes(self):
+        index = self._index()
+        self.assertEqual(index.get("sh010"), (1001, 1020, 24.0))
+        (old_index_path,) = self._index_files()
+
+        with open(self.edl_path, "a") as edl:
+            edl.write("008  TAPE6    V     C        00:00:00:00 00:00:01:00 01:00:03:16 01:00:04:16\n")
+            edl.write("* FROM CLIP NAME: sh060\n")
+        stat = os.stat(self.edl_path)
+        os.utime(self.edl_path, (stat.st_atime, stat.st_mtime + 10))
+
+        self.assertEqual(index.get("sh060"), (1001, 1024, 24.0))
+        self.assertEqual(index.get("sh010"), (1001, 1020, 24.0))
+        # the index of the previous version is removed
+        self.assertEqual(len(self._index_files()), 1)
+        self.assertNotEqual(self._index_files(), [old_index_path])
+
+    def test_settings_get_their_own_index(self):
+        self._index().get("sh010")
+        other = EditIndex(self.edl_path, self.index_prefix, 1, 24.0)
+        self.addCleanup(other.close)
+        self.assertEqual(other.get("sh010"), (1, 20, 24.0))
+
+    def test_missing_edit(self):
+        index = EditIndex(os.path.join(self.directory, "missing.edl"), self.index_prefix, 1001, 24.0)
+        with self.assertRaises(EditIndexError):
+            index.get("sh010")
+
+    def test_many_shots(self):
+        """
+        Every shot can be found when the hash table is full of collisions.
+        """
+        shots = dict(("sh%04d" % number, (number + 1, 24.0)) for number in range(500))
+        shots[""] = (10, 24.0)
+        stat = os.stat(self.edl_path)
+        index = self._index()
+        write_index(index._index_path(stat), shots, stat.st_mtime, stat.st_size, 1001, 24.0)
+
+        for number in range(500):
+            self.assertEqual(index.get("sh%04d" % number), (1001, 1001 + number, 24.0))
+        self.assertIsNone(index.get(""))
+        self.assertIsNone(index.get("sh0500"))
+
+
+if __name__ == "__main__":
+    unittest.main()
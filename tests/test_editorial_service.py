@@ -0,0 +1,224 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+End to end tests of the editorial service, with mockgun standing in for Shotgun.
+
+These need tk-core's test framework and are skipped without it.
+"""
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+try:
+    from tank_test.tank_test_base import TankTestBase, setUpModule  # noqa
+except ImportError:
+    raise unittest.SkipTest("tk-core's test framework is not available")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+
+import tk_multi_setframerange  # noqa
+from tk_multi_setframerange import editorial_service  # noqa
+
+FIELDS = ["code", "description"]
+
+
+def load_app_module():
+    """
+    Imports app.py, which isn't part of a package.
+    """
+    path = os.path.join(REPO_ROOT, "app.py")
+    try:
+        from importlib.util import module_from_spec, spec_from_file_location
+    except ImportError:
+        import imp
+
+        return imp.load_source("tk_multi_setframerange_app", path)
+
+    spec = spec_from_file_location("tk_multi_setframerange_app", path)
+    module = module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def wait_for_loads():
+    """
+    Waits for the editorial tables loading in the background.
+    """
+    for thread in threading.enumerate():
+        if thread.name == "EditorialTable":
+            thread.join(5)
+
+
+app = load_app_module()
+
+
+class FakeApp(object):
+    """
+    Just enough of SetEditData to run its editorial service methods.
+    """
+
+    # read from the class dict to get plain functions, Python 2 doesn't allow calling
+    # the unbound methods on anything other than a SetEditData
+    _query_shotgun = app.SetEditData.__dict__["_query_shotgun"]
+    _start_editorial_service = app.SetEditData.__dict__["_start_editorial_service"]
+
+    def __init__(self, shotgun, socket_path):
+        self.shotgun = shotgun
+        self.logger = logging.getLogger("tk-multi-setframerange-test")
+        self._tk_multi_setframerange = tk_multi_setframerange
+        self._shotgun_throttle = tk_multi_setframerange.RequestThrottle(0, 1)
+        self._editorial_client = editorial_service.EditorialClient(socket_path)
+        self._editorial_service = None
+        self._editorial_service_attempt = None
+
+    def get_setting(self, name):
+        return {"editorial_service_ttl": 60.0}[name]
+
+
+@unittest.skipUnless(editorial_service.is_supported(), "Unix sockets are not supported")
+class TestEditorialService(TankTestBase):
+    def setUp(self):
+        super(TestEditorialService, self).setUp()
+
+        self.shot = {
+            "type": "Shot",
+            "id": 1,
+            "code": "sh010",
+            "description": "first",
+            "project": self.project,
+        }
+        self.add_to_sg_mock_db([self.shot])
+
+        self.socket_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.socket_dir, "editorial.sock")
+        self.services = []
+
+    def tearDown(self):
+        for service in self.services:
+            service.stop()
+        shutil.rmtree(self.socket_dir)
+        super(TestEditorialService, self).tearDown()
+
+    def _start_service(self):
+        service = editorial_service.EditorialService.create(lambda: self.mockgun, self.socket_path)
+        service.start()
+        self.services.append(service)
+        return service
+
+    def _find_shot(self, client, refresh=False):
+        return client.find_one("Shot", self.shot["id"], FIELDS, project_id=self.project["id"], refresh=refresh)
+
+    def test_client_reads_from_service(self):
+        """
+        Data comes back from the project table, and refresh reads it from Shotgun again.
+        """
+        self._start_service()
+        client = editorial_service.EditorialClient(self.socket_path)
+
+        data = self._find_shot(client)
+        self.assertEqual(data["code"], "sh010")
+        self.assertEqual(data["description"], "first")
+        wait_for_loads()
+
+        self.mockgun.update("Shot", self.shot["id"], {"description": "second"})
+        self.assertEqual(self._find_shot(client)["description"], "first")
+        self.assertEqual(self._find_shot(client, refresh=True)["description"], "second")
+
+    def test_second_service_is_not_started(self):
+        """
+        Only one session runs the service.
+        """
+        self._start_service()
+        self.assertIsNone(editorial_service.EditorialService.create(lambda: self.mockgun, self.socket_path))
+
+    def test_stale_socket_is_replaced(self):
+        """
+        A socket left behind by a service that died is replaced.
+        """
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.socket_path)
+        stale.close()
+
+        self._start_service()
+        client = editorial_service.EditorialClient(self.socket_path)
+        self.assertEqual(self._find_shot(client)["code"], "sh010")
+
+    def test_shared_directory_is_refused(self):
+        """
+        The socket can't be created in a directory other users can access.
+        """
+        os.chmod(self.socket_dir, 0o777)
+        with self.assertRaises(editorial_service.EditorialServiceError):
+            editorial_service.EditorialService.create(lambda: self.mockgun, self.socket_path)
+
+    def test_app_queries_service(self):
+        """
+        The app reads from the service without touching its own Shotgun connection.
+        """
+        self._start_service()
+        fake_app = FakeApp(None, self.socket_path)
+
+        data = fake_app._query_shotgun(("Shot", self.shot["id"], tuple(FIELDS)), self.project["id"])
+        self.assertEqual(data["code"], "sh010")
+
+    def test_app_falls_back_without_service(self):
+        """
+        The app queries Shotgun directly when there is no service to reach.
+        """
+        fake_app = FakeApp(self.mockgun, self.socket_path)
+        fake_app._editorial_service_attempt = time.time()
+
+        data = fake_app._query_shotgun(("Shot", self.shot["id"], tuple(FIELDS)), self.project["id"])
+        self.assertEqual(data["code"], "sh010")
+        self.assertIsNone(fake_app._editorial_service)
+
+    def test_app_takes_over_service(self):
+        """
+        The app starts the service itself when the session running it went away.
+        """
+        self._start_service().stop()
+        self.services = []
+
+        fake_app = FakeApp(None, self.socket_path)
+        with patch("tank.util.shotgun.create_sg_connection", return_value=self.mockgun):
+            data = fake_app._query_shotgun(("Shot", self.shot["id"], tuple(FIELDS)), self.project["id"])
+        self.services.append(fake_app._editorial_service)
+
+        self.assertEqual(data["code"], "sh010")
+        self.assertIsNotNone(fake_app._editorial_service)
+
+    def test_app_does_not_retry_a_running_service(self):
+        """
+        A service run by another session that fails to answer is not asked again.
+        """
+        self._start_service()
+        fake_app = FakeApp(self.mockgun, self.socket_path)
+
+        with patch.object(
+            editorial_service.EditorialClient, "find_one", side_effect=editorial_service.EditorialServiceError("timed out")
+        ) as find_one:
+            data = fake_app._query_shotgun(("Shot", self.shot["id"], tuple(FIELDS)), self.project["id"])
+
+        self.assertEqual(data["code"], "sh010")
+        self.assertEqual(find_one.call_count, 1)
+        self.assertIsNone(fake_app._editorial_service)
@@ -0,0 +1,161 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Tests of the editorial service's in-memory table, against a backend counting its requests.
+"""
+import os
+import sys
+import threading
+import unittest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+
+from tk_multi_setframerange import editorial_service  # noqa
+
+FIELDS = ["code", "sg_cut_in"]
+PROJECT = {"type": "Project", "id": 2}
+
+
+class FakeShotgun(object):
+    """
+    Just enough of Shotgun for the table, with `find` held until `release` is set.
+    """
+
+    def __init__(self):
+        self.shots = {1: {"type": "Shot", "id": 1, "code": "sh010", "sg_cut_in": 1001}}
+        self.requests = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def find(self, entity_type, filters, fields):
+        self.requests.append("find")
+        self.release.wait(5)
+        return [self._row(shot, fields) for shot in self.shots.values()]
+
+    def find_one(self, entity_type, filters, fields):
+        self.requests.append("find_one")
+        shot = self.shots.get(filters[0][2])
+        return self._row(shot, fields) if shot else None
+
+    def _row(self, shot, fields):
+        row = {"type": shot["type"], "id": shot["id"]}
+        row.update((field, shot.get(field)) for field in fields)
+        return row
+
+
+def wait_for_loads():
+    """
+    Waits for the tables loading in the background.
+    """
+    for thread in threading.enumerate():
+        if thread.name == "EditorialTable":
+            thread.join(5)
+
+
+class TestEditorialTable(unittest.TestCase):
+    def setUp(self):
+        self.shotgun = FakeShotgun()
+        self.table = editorial_service.EditorialTable(lambda: self.shotgun, ttl=60.0)
+
+        self.now = 1000.0
+        patcher = patch.object(editorial_service, "clock", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.shotgun.release.set)
+
+    def _find_shot(self, shot_id=1, refresh=False):
+        return self.table.find_one("Shot", shot_id, FIELDS, project_id=PROJECT["id"], refresh=refresh)
+
+    def test_requests_are_answered_from_the_table(self):
+        """
+        Only the first request reaches Shotgun, the others are answered from the table.
+        """
+        self._find_shot()
+        wait_for_loads()
+        for request in range(5):
+            self.assertEqual(self._find_shot()["sg_cut_in"], 1001)
+        self.assertEqual(sorted(self.shotgun.requests), ["find", "find_one"])
+
+    def test_first_request_does_not_wait_for_the_table(self):
+        """
+        The project is loaded in the background while the entity is read on its own.
+        """
+        self.shotgun.release.clear()
+
+        self.assertEqual(self._find_shot()["code"], "sh010")
+        self.assertEqual(self._find_shot()["code"], "sh010")
+        self.assertEqual(sorted(self.shotgun.requests), ["find", "find_one", "find_one"])
+
+        self.shotgun.release.set()
+        wait_for_loads()
+        self._find_shot()
+        self.assertEqual(sorted(self.shotgun.requests), ["find", "find_one", "find_one"])
+
+    def test_refresh_reads_shotgun(self):
+        self._find_shot()
+        wait_for_loads()
+        self.shotgun.shots[1]["sg_cut_in"] = 1009
+
+        self.assertEqual(self._find_shot()["sg_cut_in"], 1001)
+        self.assertEqual(self._find_shot(refresh=True)["sg_cut_in"], 1009)
+        # and the table is updated with it
+        self.assertEqual(self._find_shot()["sg_cut_in"], 1009)
+
+    def test_out_of_date_table_answers_while_reloading(self):
+        self._find_shot()
+        wait_for_loads()
+        self.shotgun.shots[1]["sg_cut_in"] = 1009
+        self.shotgun.release.clear()
+        self.now += 61
+
+        self.assertEqual(self._find_shot()["sg_cut_in"], 1001)
+        self.assertEqual(self.shotgun.requests.count("find"), 2)
+
+        self.shotgun.release.set()
+        wait_for_loads()
+        self.assertEqual(self._find_shot()["sg_cut_in"], 1009)
+        self.assertEqual(self.shotgun.requests.count("find"), 2)
+
+    def test_new_entities_are_read_on_demand(self):
+        self._find_shot()
+        wait_for_loads()
+        self.shotgun.shots[3] = {"type": "Shot", "id": 3, "code": "sh030", "sg_cut_in": 1001}
+
+        self.assertEqual(self._find_shot(3)["code"], "sh030")
+        self._find_shot(3)
+        self.assertEqual(self.shotgun.requests.count("find_one"), 2)
+
+    def test_failed_load_is_tried_again(self):
+        def fail(*args, **kwargs):
+            raise Exception("Shotgun is down")
+
+        with patch.object(self.shotgun, "find", fail):
+            self._find_shot()
+            wait_for_loads()
+
+        self._find_shot()
+        wait_for_loads()
+        self._find_shot()
+        self.assertEqual(sorted(self.shotgun.requests), ["find", "find_one", "find_one"])
+
+    def test_project_is_not_loaded(self):
+        self.table.find_one("Project", PROJECT["id"], FIELDS, project_id=PROJECT["id"])
+        self.assertNotIn("find", self.shotgun.requests)
+
+
+if __name__ == "__main__":
+    unittest.main()
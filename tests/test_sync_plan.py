@@ -0,0 +1,90 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Tests of the Qt free sync plan.
+"""
+import os
+import sys
+import unittest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+
+from tk_multi_setframerange import EditorialData, Entity, build_sync_plan  # noqa
+
+SHOT = {"type": "Shot", "id": 1, "name": "sh010"}
+
+
+class TestBuildSyncPlan(unittest.TestCase):
+    def test_in_sync(self):
+        plan = build_sync_plan(SHOT, (1001, 1100, 24.0), (1001, 1100, 24.0))
+        self.assertTrue(plan.in_sync)
+        self.assertFalse(plan.update_range)
+        self.assertFalse(plan.update_rate)
+        self.assertEqual(plan.changes, EditorialData(None, None, None))
+
+    def test_range_only(self):
+        """
+        The whole range is given when only one end differs, and the rate is left alone.
+        """
+        plan = build_sync_plan(SHOT, (1001, 1120, 24.0), (1001, 1100, 24.0))
+        self.assertEqual(plan.fields, ("out_frame",))
+        self.assertTrue(plan.update_range)
+        self.assertFalse(plan.update_rate)
+        self.assertEqual(plan.changes, EditorialData(1001, 1120, None))
+
+    def test_rate_only(self):
+        plan = build_sync_plan(SHOT, (1001, 1100, 25.0), (1001, 1100, 24.0))
+        self.assertEqual(plan.fields, ("frame_rate",))
+        self.assertFalse(plan.update_range)
+        self.assertTrue(plan.update_rate)
+        self.assertEqual(plan.changes, EditorialData(None, None, 25.0))
+
+    def test_range_and_rate(self):
+        plan = build_sync_plan(SHOT, (1009, 1120, 25.0), (1001, 1100, 24.0))
+        self.assertEqual(plan.fields, ("in_frame", "out_frame", "frame_rate"))
+        self.assertEqual(plan.changes, EditorialData(1009, 1120, 25.0))
+
+    def test_range_not_set_in_shotgun(self):
+        """
+        A range missing either end in Shotgun is never applied.
+        """
+        for shotgun in [(None, 1120, 24.0), (1009, None, 24.0), (None, None, 24.0)]:
+            plan = build_sync_plan(SHOT, shotgun, (1001, 1100, 24.0))
+            self.assertTrue(plan.in_sync)
+            self.assertEqual(plan.changes, EditorialData(None, None, None))
+
+    def test_rate_not_set_in_shotgun(self):
+        plan = build_sync_plan(SHOT, (1001, 1120, None), (1001, 1100, 24.0))
+        self.assertEqual(plan.fields, ("out_frame",))
+        self.assertEqual(plan.changes, EditorialData(1001, 1120, None))
+
+    def test_plan_is_immutable(self):
+        """
+        The entity is copied into the plan, so changing the dict doesn't change the plan.
+        """
+        entity = dict(SHOT)
+        plan = build_sync_plan(entity, (1001, 1100, 24.0), (1001, 1100, 24.0))
+        entity["id"] = 2
+
+        self.assertEqual(plan.entity, Entity("Shot", 1, "sh010"))
+        with self.assertRaises(AttributeError):
+            plan.entity.id = 2
+        with self.assertRaises(AttributeError):
+            plan.fields = ()
+
+    def test_entity_without_name(self):
+        plan = build_sync_plan({"type": "Shot", "id": 1}, (1001, 1100, 24.0), (1001, 1100, 24.0))
+        self.assertEqual(plan.entity, Entity("Shot", 1, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+# Copyright (c) 2013 Shotgun Software Inc.
+#
+# CONFIDENTIAL AND PROPRIETARY
+#
+# This work is provided "AS IS" and subject to the Shotgun Pipeline Toolkit
+# Source Code License included in this distribution package. See LICENSE.
+# By accessing, using, copying or modifying this work you indicate your
+# agreement to the Shotgun Pipeline Toolkit Source Code License. All rights
+# not expressly granted therein are reserved by Shotgun Software Inc.
+
+"""
+Tests of the Shotgun request throttle, with a fake clock so nothing actually waits.
+"""
+import os
+import sys
+import threading
+import unittest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "python"))
+
+from tk_multi_setframerange import throttle  # noqa
+from tk_multi_setframerange.throttle import RequestThrottle, is_rate_limited  # noqa
+
+
+class FakeClock(object):
+    """
+    A clock that only moves when something sleeps, recording every sleep.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeFault(Exception):
+    """
+    Stands in for the xmlrpc ProtocolError Shotgun raises for HTTP errors.
+    """
+
+    def __init__(self, errcode, message="Fault"):
+        super(FakeFault, self).__init__(message)
+        self.errcode = errcode
+
+
+class ThrottleTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        for patcher in [
+            patch.object(throttle, "clock", self.clock),
+            patch.object(throttle, "time", self.clock),
+            # no jitter, every wait is its shortest
+            patch.object(throttle, "random", type("Random", (), {"uniform": staticmethod(lambda a, b: a)})),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestTokenBucket(ThrottleTestCase):
+    def test_burst_then_rate(self):
+        """
+        The burst goes through at once, then requests are spaced out at the rate.
+        """
+        requests = RequestThrottle(2, 3)
+        for index in range(5):
+            self.assertEqual(requests.call(index, lambda: "ok"), "ok")
+
+        self.assertEqual(self.clock.sleeps, [0.5, 0.5])
+        self.assertEqual(requests.stats, {"requests": 5, "throttled": 2, "coalesced": 0, "retried": 0})
+
+    def test_tokens_refill(self):
+        requests = RequestThrottle(2, 2)
+        requests.call(1, lambda: None)
+        requests.call(2, lambda: None)
+
+        # one second refills both tokens
+        self.clock.now += 1
+        requests.call(3, lambda: None)
+        requests.call(4, lambda: None)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_tokens_capped_at_burst(self):
+        requests = RequestThrottle(2, 2)
+        self.clock.now += 3600
+        for index in range(3):
+            requests.call(index, lambda: None)
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_no_rate(self):
+        requests = RequestThrottle(0, 1)
+        for index in range(10):
+            requests.call(index, lambda: None)
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(requests.stats["throttled"], 0)
+
+
+class TestRetries(ThrottleTestCase):
+    def _flaky(self, errors):
+        """
+        Returns a function raising `errors` one call at a time, then returning "ok".
+        """
+        errors = list(errors)
+        calls = []
+
+        def func():
+            calls.append(None)
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+
+        return (func, calls)
+
+    def test_rate_limited_requests_are_retried(self):
+        (func, calls) = self._flaky([FakeFault(429), FakeFault(503), Exception("Too Many Requests")])
+        requests = RequestThrottle(0, 1, backoff=0.5)
+
+        self.assertEqual(requests.call("key", func), "ok")
+        self.assertEqual(len(calls), 4)
+        # half of 0.5, 1.0 and 2.0 seconds without jitter
+        self.assertEqual(self.clock.sleeps, [0.25, 0.5, 1.0])
+        self.assertEqual(requests.stats["retried"], 3)
+
+    def test_backoff_is_capped(self):
+        (func, calls) = self._flaky([FakeFault(429)] * 4)
+        requests = RequestThrottle(0, 1, backoff=1.0, max_backoff=2.0)
+        requests.call("key", func)
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0, 1.0, 1.0])
+
+    def test_other_errors_are_not_retried(self):
+        (func, calls) = self._flaky([FakeFault(404, "Not Found")])
+        requests = RequestThrottle(0, 1)
+
+        with self.assertRaises(FakeFault):
+            requests.call("key", func)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(requests.stats["retried"], 0)
+
+    def test_retries_run_out(self):
+        (func, calls) = self._flaky([FakeFault(429)] * 3)
+        requests = RequestThrottle(0, 1, retries=2)
+
+        with self.assertRaises(FakeFault):
+            requests.call("key", func)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(requests.stats["retried"], 2)
+
+    def test_retries_take_tokens(self):
+        (func, calls) = self._flaky([FakeFault(429)])
+        requests = RequestThrottle(1, 1, backoff=0.5)
+        requests.call("key", func)
+        # the retry waits for the backoff, then for the rest of the token
+        self.assertEqual(self.clock.sleeps, [0.25, 0.75])
+
+    def test_is_rate_limited(self):
+        self.assertTrue(is_rate_limited(FakeFault(429)))
+        self.assertTrue(is_rate_limited(FakeFault(503)))
+        self.assertTrue(is_rate_limited(Exception("API rate limit exceeded")))
+        self.assertTrue(is_rate_limited(Exception("429 Too Many Requests")))
+        self.assertFalse(is_rate_limited(FakeFault(500)))
+        self.assertFalse(is_rate_limited(Exception("Field does not exist")))
+
+
+class TestCoalescing(unittest.TestCase):
+    def _call_while_in_flight(self, func):
+        """
+        Sends a request with `func` and a second identical one while the first is in
+        flight, returning the throttle, the number of calls of `func` and both outcomes.
+        """
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        outcomes = {}
+
+        def slow():
+            calls.append(None)
+            started.set()
+            release.wait(5)
+            return func()
+
+        requests = RequestThrottle(0, 1)
+
+        def send(name):
+            try:
+                outcomes[name] = requests.call("key", slow)
+            except Exception as err:
+                outcomes[name] = err
+
+        leader = threading.Thread(target=send, args=("leader",))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=send, args=("follower",))
+        follower.start()
+
+        # let the first request finish once the second one is waiting on it
+        for attempt in range(500):
+            if requests.coalesced:
+                break
+            threading.Event().wait(0.01)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        return (requests, len(calls), outcomes)
+
+    def test_identical_requests_share_a_response(self):
+        (requests, calls, outcomes) = self._call_while_in_flight(lambda: {"id": 1})
+        self.assertEqual(calls, 1)
+        self.assertEqual(outcomes, {"leader": {"id": 1}, "follower": {"id": 1}})
+        self.assertEqual(requests.stats["coalesced"], 1)
+
+    def test_error_is_raised_to_waiters(self):
+        error = FakeFault(404, "Not Found")
+
+        def fail():
+            raise error
+
+        (requests, calls, outcomes) = self._call_while_in_flight(fail)
+        self.assertEqual(calls, 1)
+        self.assertIs(outcomes["leader"], error)
+        self.assertIs(outcomes["follower"], error)
+
+    def test_later_requests_are_sent_again(self):
+        requests = RequestThrottle(0, 1)
+        calls = []
+        requests.call("key", lambda: calls.append(None))
+        requests.call("key", lambda: calls.append(None))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(requests.stats["coalesced"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()